@@ -1,9 +1,9 @@
-import yfinance as yf
 import pandas as pd
+from utils import _ticker
 
 def check_info(ticker):
     try:
-        stock = yf.Ticker(ticker)
+        stock = _ticker(ticker)
         print(f"--- Info for {ticker} ---")
         
         # Check cashflow DataFrame
@@ -12,11 +12,12 @@ def check_info(ticker):
             print("Cashflow DataFrame Head:")
             print(cf.head())
             
-            if 'Free Cash Flow' in cf.index:
+            cf_rows = set(cf.index)
+            if 'Free Cash Flow' in cf_rows:
                  print(f"Free Cash Flow from DF: {cf.loc['Free Cash Flow'].iloc[0]}")
             else:
                  print(" 'Free Cash Flow' index not found.")
-                 if 'Operating Cash Flow' in cf.index and 'Capital Expenditure' in cf.index:
+                 if 'Operating Cash Flow' in cf_rows and 'Capital Expenditure' in cf_rows:
                      ops = cf.loc['Operating Cash Flow'].iloc[0]
                      capex = cf.loc['Capital Expenditure'].iloc[0]
                      fcf = ops + capex
@@ -1,9 +1,8 @@
-from utils import fetch_stock_info
-import yfinance as yf
+from utils import fetch_stock_info, _ticker
 
 def check_shares(ticker):
     print(f"--- Checking Shares for {ticker} ---")
-    stock = yf.Ticker(ticker)
+    stock = _ticker(ticker)
     
     # Check standard info
     try:
@@ -1,9 +1,24 @@
+import asyncio
+import hashlib
+import html
 import streamlit as st
-import plotly.graph_objects as go
-from utils import fetch_stock_data, fetch_stock_info, calculate_indicators, calculate_dcf, calculate_wacc, fetch_stock_news, fetch_analyst_ratings
-from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils import calculate_indicators, calculate_dcf, calculate_dcf_grid, calculate_wacc, fetch_all
 
-def plot_chart(df, ticker):
+def _df_fingerprint(df_np):
+    """
+    Cheap content hash of a price history (index + Close), used as a cache key.
+    """
+    payload = df_np['index'].tobytes() + df_np['close'].tobytes()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+@st.cache_resource(max_entries=32)
+def plot_chart(df_hash, ticker, _df):
+    # The figure is a pure function of the history, so it is keyed on df_hash;
+    # _df itself is excluded from Streamlit's argument hashing.
+    import plotly.graph_objects as go # Deferred: only the Charts view needs plotly
+    df = _df
     fig = go.Figure()
     
     # Candlestick
@@ -44,12 +59,23 @@ def main():
     
     if st.sidebar.button("Analyze"):
         with st.spinner('Fetching data...'):
-            # Fetch Data
-            df = fetch_stock_data(ticker, period, interval)
-            info = fetch_stock_info(ticker)
+            # Reuse the last close we already hold for this ticker as the price fallback
+            latest_close = None
+            if st.session_state.get('ticker') == ticker and 'df_np' in st.session_state:
+                latest_close = float(st.session_state['df_np']['close'][-1])
+
+            # Fetch Data (all Yahoo requests are independent, so they run concurrently)
+            df, info, news, ratings = asyncio.run(fetch_all(ticker, period, interval, latest_close))
             
             if df is not None:
+                # Calculate Indicators once per fetch and keep the enriched frame
+                df = calculate_indicators(df)
                 st.session_state['data'] = df
+                st.session_state['df_np'] = {
+                    'index': df.index.values,
+                    'close': df['Close'].to_numpy(),
+                }
+                st.session_state['tail_view'] = df.iloc[-5:][['Open', 'High', 'Low', 'Close', 'Volume']].reset_index()
                 st.session_state['info'] = info
                 st.session_state['ticker'] = ticker
                 
@@ -57,19 +83,12 @@ def main():
                 wacc, re, rd = calculate_wacc(ticker, info)
                 st.session_state['wacc_data'] = {'wacc': wacc, 're': re, 'rd': rd}
                 
-                # Fetch News (and cache it)
-                try:
-                    news = fetch_stock_news(ticker)
-                    st.session_state['news'] = news
-                except:
-                    st.session_state['news'] = []
+                # Cache News
+                st.session_state['news'] = news or []
                     
-                # Fetch Ratings (and cache it)
-                try:
-                    recs, upgrades = fetch_analyst_ratings(ticker)
-                    st.session_state['ratings'] = {'recs': recs, 'upgrades': upgrades}
-                except:
-                     st.session_state['ratings'] = None
+                # Cache Ratings
+                recs, upgrades = ratings
+                st.session_state['ratings'] = {'recs': recs, 'upgrades': upgrades}
             else:
                 st.error("Error fetching data. Please check the ticker symbol.")
 
@@ -78,11 +97,9 @@ def main():
         info = st.session_state['info']
         display_ticker = st.session_state['ticker'] # Use stored ticker for logic
         
-        # Calculate Indicators (in case we didn't store them or want to recalc)
-        # It's better to calc once and store, but adding it here is fast enough usually.
-        # Let's perform calculation if columns missing
-        if 'SMA_20' not in df.columns:
-             df = calculate_indicators(df)
+        df_np = st.session_state['df_np']
+        # Indicators are calculated once in the Analyze handler
+        assert 'SMA_20' in df.columns
 
         # Display Info
         price = 'N/A'
@@ -118,10 +135,10 @@ def main():
 
         if view == "Charts":
             # Plot Chart
-            st.plotly_chart(plot_chart(df, display_ticker), use_container_width=True)
+            st.plotly_chart(plot_chart(_df_fingerprint(df_np), display_ticker, df), use_container_width=True)
             # Show Data
             st.subheader("Historical Data")
-            st.dataframe(df.tail())
+            st.dataframe(st.session_state['tail_view'])
 
         elif view == "Technical Analysis":
             st.subheader("Technical Indicators")
@@ -204,6 +221,19 @@ def main():
                             st.metric("Intrinsic Value per Share", f"{currency_symbol}{res:,.2f}", delta=f"{((res - price)/price)*100:.2f}%" if isinstance(price, (int, float)) else None)
                             st.write(f"**Assumptions used:** Growth: {current_state['growth_rate']}%, Terminal: {current_state['terminal_rate']}%, WACC: {current_state['discount_rate']}%")
                             st.write(f"**Financials:** FCF: {currency_symbol}{fcf:,}, Shares: {shares:,}, Net Debt: {currency_symbol}{net_debt:,}")
+
+                            # Sensitivity of the result to growth and discount rate (+/- 2pp around the inputs)
+                            st.write("### Sensitivity (Intrinsic Value per Share)")
+                            growth_steps = current_state['growth_rate'] + np.arange(-2.0, 2.5, 1.0)
+                            discount_steps = current_state['discount_rate'] + np.arange(-2.0, 2.5, 1.0)
+                            g_grid, d_grid = np.meshgrid(growth_steps / 100, discount_steps / 100)
+                            grid_values = calculate_dcf_grid(fcf, shares, net_debt, g_grid, d_grid, current_state['terminal_rate'] / 100)
+                            sensitivity = pd.DataFrame(
+                                grid_values,
+                                index=pd.Index([f"{d:.2f}%" for d in discount_steps], name="WACC"),
+                                columns=pd.Index([f"{g:.2f}%" for g in growth_steps], name="Growth"),
+                            )
+                            st.dataframe(sensitivity.style.format(f"{currency_symbol}{{:,.2f}}", na_rep="N/A"))
                         else:
                             st.error("Could not calculate DCF (Result is None).")
 
@@ -216,6 +246,7 @@ def main():
             st.subheader("Latest News Headlines")
             news_items = st.session_state.get('news', [])
             if news_items:
+                parsed_items = []
                 for item in news_items:
                     # yfinance news item structure can be flat or nested in 'content'
                     # Try flat first (older versions)
@@ -238,26 +269,33 @@ def main():
                         elif 'clickThroughUrl' in c and c['clickThroughUrl']:
                              link = c['clickThroughUrl'].get('url')
 
-                    # Formatting Time
-                    time_str = "Recent"
-                    if pub_time:
-                        try:
-                             if isinstance(pub_time, int):
-                                 dt_object = datetime.fromtimestamp(pub_time)
-                                 time_str = dt_object.strftime("%Y-%m-%d %H:%M")
-                             else:
-                                 # ISO format string '2025-12-19T21:38:00Z'
-                                 dt_object = datetime.strptime(pub_time.replace('Z', '+0000'), "%Y-%m-%dT%H:%M:%S%z")
-                                 time_str = dt_object.strftime("%Y-%m-%d %H:%M")
-                        except: pass
+                    parsed_items.append((title, publisher, link, pub_time))
 
+                # Formatting Time: parse all timestamps in one pass.
+                # Epoch seconds (older versions) or ISO strings like '2025-12-19T21:38:00Z' (newer)
+                pub_times = [p[3] for p in parsed_items]
+                epoch_times = pd.to_datetime(
+                    pd.Series([t if isinstance(t, int) else None for t in pub_times], dtype='float64'),
+                    unit='s', errors='coerce', utc=True)
+                iso_times = pd.to_datetime(
+                    pd.Series([t if isinstance(t, str) else None for t in pub_times], dtype='object'),
+                    format='ISO8601', errors='coerce', utc=True)
+                time_strs = epoch_times.fillna(iso_times).dt.strftime("%Y-%m-%d %H:%M").fillna("Recent")
+
+                # Render all items as collapsible <details> blocks in a single markdown element
+                blocks = []
+                for (title, publisher, link, _), time_str in zip(parsed_items, time_strs):
                     if title:
-                        with st.expander(f"{time_str} - {title}"):
-                            st.write(f"**Source:** {publisher}")
-                            if link:
-                                st.markdown(f"[Read full article]({link})")
-                            else:
-                                st.write("No link available")
+                        # Raw HTML skips the markdown URL sanitizer, so only allow web links
+                        if link and link.lower().startswith(("http://", "https://")):
+                            link_html = f'<a href="{html.escape(link)}" target="_blank">Read full article</a>'
+                        else:
+                            link_html = "No link available"
+                        blocks.append(
+                            f"<details><summary>{html.escape(time_str)} - {html.escape(title)}</summary>"
+                            f"<p><b>Source:</b> {html.escape(str(publisher))}<br>{link_html}</p></details>"
+                        )
+                st.markdown("\n".join(blocks), unsafe_allow_html=True)
             else:
                 st.info("No news found for this ticker.")
                 
@@ -1,108 +1,164 @@
-import yfinance as yf
+import asyncio
+import functools
+import streamlit as st
+import numpy as np
 import pandas as pd
-import ta
+from concurrent.futures import ThreadPoolExecutor
+
+# Statement row labels to try, in order of preference
+_DEBT_ROWS = ('Total Debt', 'Long Term Debt') # Long Term Debt is a partial fallback
+_CASH_ROWS = ('Cash And Cash Equivalents', 'Cash Cash Equivalents And Short Term Investments')
+_INTEREST_ROWS = ('Interest Expense', 'Interest Expense Non Operating')
+
+# yfinance is imported inside the functions that need it,
+# so importing utils (and the app's first paint) doesn't pay for it.
+
+@st.cache_resource(ttl=300, max_entries=256, show_spinner=False)
+def _ticker(symbol):
+    """
+    Returns a shared yf.Ticker instance so repeated lookups reuse yfinance's per-Ticker cache.
+    yfinance keeps fetched data on the instance, so it expires with the same TTL as the cached
+    fetches; otherwise refetches would keep reading the first values.
+    """
+    import yfinance as yf
+    return yf.Ticker(symbol)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_stock_data(ticker, period, interval):
+    # Raises on failure so Streamlit doesn't cache it; an empty download is also a failure
+    # (yfinance returns one on network errors and rate limits).
+    import yfinance as yf
+    data = yf.download(ticker, period=period, interval=interval, progress=False, auto_adjust=True, actions=False)
+    if data.empty:
+        raise ValueError("no price data returned")
+    # Newer yfinance returns (Price, Ticker) columns even for a single ticker
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    # Keep only what the app uses, in compact dtypes
+    data = data[['Open', 'High', 'Low', 'Close', 'Volume']].astype({c: np.float32 for c in ('Open', 'High', 'Low', 'Close')})
+    data['Volume'] = pd.to_numeric(data['Volume'], downcast='integer')
+    return data
 
 def fetch_stock_data(ticker, period="1y", interval="1d"):
     """
     Fetches historical stock data for a given ticker.
     """
     try:
-        data = yf.download(ticker, period=period, interval=interval, progress=False)
-        if data.empty:
-            return None
-        return data
+        return _fetch_stock_data(ticker, period, interval)
     except Exception as e:
         print(f"Error fetching data for {ticker}: {e}")
         return None
 
-def fetch_stock_info(ticker):
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_stock_info(ticker, _latest_close=None):
+    # Raises if info itself can't be fetched so Streamlit doesn't cache the failure.
+    # _latest_close is a fallback only, so the leading underscore keeps it out of the cache key.
+    stock = _ticker(ticker)
+
+    # info and the last price are always needed, so fetch them together
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        info_future = executor.submit(lambda: dict(stock.info)) # Copy: the Ticker's own dict is shared
+        last_price_future = executor.submit(lambda: stock.fast_info.get('last_price'))
+
+    info = info_future.result()
+    if not info:
+        raise ValueError("no info returned")
+
+    # The statements are only requested when info lacks the fields they back,
+    # which is rare for most tickers; when both are needed they're fetched together.
+    needs_fcf = 'freeCashFlow' not in info or info['freeCashFlow'] is None
+    needs_debt = 'totalDebt' not in info or info['totalDebt'] is None
+    needs_cash = 'totalCash' not in info or info['totalCash'] is None
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        cashflow_future = executor.submit(lambda: stock.cashflow) if needs_fcf else None
+        balance_sheet_future = executor.submit(lambda: stock.balance_sheet) if needs_debt or needs_cash else None
+
+    # 1. Update Price from History if needed (often more accurate/realtime for non-US)
+    # Fetch 2 days of minute data or 1 day of daily to get latest close
+    try:
+         # Fast info is often better for last price
+         last_price = last_price_future.result()
+         if last_price:
+             info['currentPrice'] = last_price
+             info['regularMarketPrice'] = last_price
+         elif _latest_close is not None:
+             info['currentPrice'] = _latest_close
+             info['regularMarketPrice'] = _latest_close
+         else:
+             # Fallback to recent history (only the latest daily bar is needed)
+             recent = stock.history(period="1d", interval="1d")
+             if not recent.empty:
+                 info['currentPrice'] = recent['Close'].iloc[-1]
+                 info['regularMarketPrice'] = recent['Close'].iloc[-1]
+    except Exception as e:
+        print(f"Error fetching latest price update: {e}")
+
+    # 1. Update Price from History... (kept previous block above)
+    # ...
+
+    # 2. Update Shares from fast_info if missing (Crucial for DCF)
+    if 'sharesOutstanding' not in info or info['sharesOutstanding'] is None:
+         try:
+             shares = stock.fast_info.get('shares')
+             if shares:
+                 info['sharesOutstanding'] = shares
+         except Exception: pass
+
+    # 3. Robust FCF Extraction
+    if needs_fcf:
+        try:
+            cf = cashflow_future.result()
+            if not cf.empty:
+                cf_idx = {name: i for i, name in enumerate(cf.index)}
+                cf_values = cf.to_numpy()
+                # Look for first non-NaN FCF
+                if 'Free Cash Flow' in cf_idx:
+                    # Scan the row for the first valid column
+                    row = cf_values[cf_idx['Free Cash Flow']]
+                    valid = np.flatnonzero(pd.notna(row) & (row != 0))
+                    if valid.size:
+                        info['freeCashFlow'] = row[valid[0]]
+
+                elif 'Operating Cash Flow' in cf_idx and 'Capital Expenditure' in cf_idx:
+                    # Fallback calculation
+                     ops = cf_values[cf_idx['Operating Cash Flow']]
+                     capex = cf_values[cf_idx['Capital Expenditure']]
+                     valid = np.flatnonzero(pd.notna(ops) & pd.notna(capex))
+                     if valid.size:
+                         info['freeCashFlow'] = ops[valid[0]] + capex[valid[0]]
+        except Exception as e:
+            print(f"Error extracting FCF from DataFrame: {e}")
+
+    # 4. Robust Total Debt/Cash Extraction (one balance sheet serves both lookups)
+    if needs_debt or needs_cash:
+         try:
+             # Try key variations
+             if 'totalDebt' in info and needs_debt: del info['totalDebt']
+
+             bs = balance_sheet_future.result()
+             if bs is not None and not bs.empty:
+                  bs_idx = {name: i for i, name in enumerate(bs.index)}
+                  latest = bs.to_numpy()[:, 0]
+                  # Try specific keys in balance sheet
+                  debt_row = next((n for n in _DEBT_ROWS if n in bs_idx), None)
+                  cash_row = next((n for n in _CASH_ROWS if n in bs_idx), None)
+                  if needs_debt and debt_row:
+                       info['totalDebt'] = latest[bs_idx[debt_row]]
+                  if needs_cash and cash_row:
+                       info['totalCash'] = latest[bs_idx[cash_row]]
+         except: pass
+
+    return info
+
+def fetch_stock_info(ticker, latest_close=None):
     """
     Fetches fundamental info for a given ticker, ensuring FCF is present and Price is accurate.
+    If fast_info has no last price, latest_close (e.g. from already fetched history) is used
+    before falling back to another history request.
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        
-        # 1. Update Price from History if needed (often more accurate/realtime for non-US)
-        # Fetch 2 days of minute data or 1 day of daily to get latest close
-        try:
-             # Fast info is often better for last price
-             last_price = stock.fast_info.get('last_price')
-             if last_price:
-                 info['currentPrice'] = last_price
-                 info['regularMarketPrice'] = last_price
-             else:
-                 # Fallback to recent history
-                 recent = stock.history(period="5d")
-                 if not recent.empty:
-                     info['currentPrice'] = recent['Close'].iloc[-1]
-                     info['regularMarketPrice'] = recent['Close'].iloc[-1]
-        except Exception as e:
-            print(f"Error fetching latest price update: {e}")
-
-        # 1. Update Price from History... (kept previous block above)
-        # ...
-
-        # 2. Update Shares from fast_info if missing (Crucial for DCF)
-        if 'sharesOutstanding' not in info or info['sharesOutstanding'] is None:
-             try:
-                 shares = stock.fast_info.get('shares')
-                 if shares:
-                     info['sharesOutstanding'] = shares
-             except Exception: pass
-
-        # 3. Robust FCF Extraction
-        if 'freeCashFlow' not in info or info['freeCashFlow'] is None:
-            try:
-                cf = stock.cashflow
-                if not cf.empty:
-                    # Look for first non-NaN FCF
-                    if 'Free Cash Flow' in cf.index:
-                        # Iterate cols to find valid value
-                        for col in cf.columns:
-                            val = cf.loc['Free Cash Flow', col]
-                            if pd.notna(val) and val != 0:
-                                info['freeCashFlow'] = val
-                                break
-                                
-                    elif 'Operating Cash Flow' in cf.index and 'Capital Expenditure' in cf.index:
-                        # Fallback calculation
-                         for col in cf.columns:
-                             ops = cf.loc['Operating Cash Flow', col]
-                             capex = cf.loc['Capital Expenditure', col]
-                             if pd.notna(ops) and pd.notna(capex):
-                                 info['freeCashFlow'] = ops + capex
-                                 break
-            except Exception as e:
-                print(f"Error extracting FCF from DataFrame: {e}")
-                
-        # 4. Robust Total Debt/Cash Extraction
-        if 'totalDebt' not in info or info['totalDebt'] is None:
-             try:
-                 # Try key variations
-                 if 'totalDebt' in info: del info['totalDebt']
-                 
-                 bs = stock.balance_sheet
-                 if not bs.empty:
-                      # Try specific keys in balance sheet
-                      if 'Total Debt' in bs.index:
-                           info['totalDebt'] = bs.loc['Total Debt'].iloc[0]
-                      elif 'Long Term Debt' in bs.index: # Fallback partial
-                           info['totalDebt'] = bs.loc['Long Term Debt'].iloc[0]
-                           
-             except: pass
-             
-        if 'totalCash' not in info or info['totalCash'] is None:
-             try:
-                 bs = stock.balance_sheet
-                 if not bs.empty:
-                      if 'Cash And Cash Equivalents' in bs.index:
-                           info['totalCash'] = bs.loc['Cash And Cash Equivalents'].iloc[0]
-                      elif 'Cash Cash Equivalents And Short Term Investments' in bs.index:
-                           info['totalCash'] = bs.loc['Cash Cash Equivalents And Short Term Investments'].iloc[0]
-             except: pass
-
-        return info
+        return _fetch_stock_info(ticker, latest_close)
     except Exception as e:
         print(f"Error fetching info for {ticker}: {e}")
         return None
@@ -117,7 +173,7 @@ def calculate_indicators(df):
     # Ensure we are working with a clean dataframe (sometimes simple Moving Averages fail with multi-level index)
     # yfinance download might return MultiIndex if multiple tickers, but here we just do one.
     # However, sometimes it returns columns like (Adj Close, TICKER).
-    # We will assume a single level or handle it if needed, but for now standard ta should work on Series.
+    # We will assume a single level or handle it if needed, but for now the pandas window functions work on Series.
     
     # If using yfinance 0.2+, the columns might be multi-level if not flattened.
     # But let's assume standard 'Close' column exists or is accessible.
@@ -127,63 +183,124 @@ def calculate_indicators(df):
         if isinstance(df.columns, pd.MultiIndex):
              df = df.xs(df.columns.levels[1][0], axis=1, level=1)
 
+        close = df['Close']
+
+        # Indicators are only charted, so store them as float32 (half the footprint of the
+        # cached/session frame). The window kernels still accumulate in float64.
         # Simple Moving Averages
-        df['SMA_20'] = ta.trend.sma_indicator(df['Close'], window=20)
-        df['SMA_50'] = ta.trend.sma_indicator(df['Close'], window=50)
+        df['SMA_20'] = close.rolling(window=20).mean().astype(np.float32)
+        df['SMA_50'] = close.rolling(window=50).mean().astype(np.float32)
         
-        # RSI
-        df['RSI'] = ta.momentum.rsi(df['Close'], window=14)
+        # RSI (Wilder smoothing of average gains/losses)
+        delta = close.diff()
+        # where() (not clip) so the leading NaN from diff() counts as 0, matching ta's warm-up
+        avg_gain = delta.where(delta > 0, 0.0).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+        avg_loss = (-delta.where(delta < 0, 0.0)).ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+        df['RSI'] = rsi.mask(avg_loss == 0, 100.0).astype(np.float32)
         
-        # MACD
-        macd = ta.trend.MACD(df['Close'])
-        df['MACD'] = macd.macd()
-        df['MACD_Signal'] = macd.macd_signal()
+        # MACD (12/26 EMA spread with 9 EMA signal line)
+        ema_fast = close.ewm(span=12, min_periods=12, adjust=False).mean()
+        ema_slow = close.ewm(span=26, min_periods=26, adjust=False).mean()
+        macd = ema_fast - ema_slow
+        df['MACD'] = macd.astype(np.float32)
+        df['MACD_Signal'] = macd.ewm(span=9, min_periods=9, adjust=False).mean().astype(np.float32)
     except Exception as e:
         print(f"Error calculating indicators: {e}")
     
     return df
 
+@functools.lru_cache(maxsize=64)
+def make_dcf_kernel(free_cash_flow, shares_outstanding, net_debt):
+    """
+    Returns a function (growth_rate, discount_rate, terminal_growth_rate) -> intrinsic value per share
+    with the company's FCF, share count and net debt folded in as per-share constants.
+    
+    The returned function broadcasts over NumPy arrays and returns an ndarray (0-d for scalar inputs);
+    undefined points (discount_rate equal to terminal_growth_rate) come out as NaN.
+    """
+    fcf_per_share = free_cash_flow / shares_outstanding
+    net_debt_per_share = net_debt / shares_outstanding
+
+    def dcf_kernel(growth_rate, discount_rate, terminal_growth_rate):
+        discount_rate = np.asarray(discount_rate, dtype=float)
+        terminal_growth_rate = np.asarray(terminal_growth_rate, dtype=float)
+        growth = 1 + np.asarray(growth_rate, dtype=float)
+        discount = 1 + discount_rate
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Discounted FCF for years 1-5 is a geometric series with ratio r
+            # (r == 1 is the 0/0 singularity, where the sum is exactly 5)
+            r = growth / discount
+            series_factor = np.where(r == 1.0, 5.0, r * (1 - r ** 5) / (1 - r))
+
+            # Terminal Value, discounted back 5 years. The spread is taken from the raw rates:
+            # (1 + d) - 1 - t leaves rounding residue when d == t instead of an exact 0.
+            spread = np.where(np.isclose(discount_rate, terminal_growth_rate), np.nan, discount_rate - terminal_growth_rate)
+            terminal_factor = r ** 5 * (1 + terminal_growth_rate) / spread
+
+            return fcf_per_share * (series_factor + terminal_factor) - net_debt_per_share
+
+    return dcf_kernel
+
 def calculate_dcf(free_cash_flow, growth_rate, discount_rate, terminal_growth_rate, shares_outstanding, net_debt):
     """
     Calculates the intrinsic value per share using Discounted Cash Flow analysis.
     
     Args:
         free_cash_flow (float): Recent Free Cash Flow.
-        growth_rate (float): Expected annual growth rate for the next 5 years (decimal, e.g., 0.10 for 10%).
-        discount_rate (float): Discount rate or WACC (decimal, e.g., 0.10 for 10%).
+        growth_rate (float or np.ndarray): Expected annual growth rate for the next 5 years (decimal, e.g., 0.10 for 10%).
+        discount_rate (float or np.ndarray): Discount rate or WACC (decimal, e.g., 0.10 for 10%).
         terminal_growth_rate (float): Terminal growth rate (decimal, e.g., 0.025 for 2.5%).
         shares_outstanding (int): Number of shares outstanding.
         net_debt (float): Total Debt - Total Cash.
         
     Returns:
-        float: Intrinsic Value per Share.
+        float: Intrinsic Value per Share. If growth_rate/discount_rate are arrays (e.g. a meshgrid),
+        an array of values broadcast over them, with NaN where the valuation is undefined.
     """
     try:
-        # Calculate Future Cash Flows for 5 years
-        future_cash_flows = []
-        for i in range(1, 6):
-            fcf = free_cash_flow * ((1 + growth_rate) ** i)
-            discounted_fcf = fcf / ((1 + discount_rate) ** i)
-            future_cash_flows.append(discounted_fcf)
-            
-        # Calculate Terminal Value
-        terminal_value_fcf = free_cash_flow * ((1 + growth_rate) ** 5) * (1 + terminal_growth_rate)
-        terminal_value = terminal_value_fcf / (discount_rate - terminal_growth_rate)
-        discounted_terminal_value = terminal_value / ((1 + discount_rate) ** 5)
-        
-        # Total Enterprise Value
-        enterprise_value = sum(future_cash_flows) + discounted_terminal_value
-        
-        # Equity Value
-        equity_value = enterprise_value - net_debt
-        
-        # Value per Share
-        intrinsic_value = equity_value / shares_outstanding
-        return intrinsic_value
+        dcf_kernel = make_dcf_kernel(free_cash_flow, shares_outstanding, net_debt)
+        intrinsic_value = dcf_kernel(growth_rate, discount_rate, terminal_growth_rate)
+
+        if intrinsic_value.ndim:
+            return np.where(np.isfinite(intrinsic_value), intrinsic_value, np.nan)
+        if not np.isfinite(intrinsic_value):
+            return None
+        return float(intrinsic_value)
     except Exception as e:
         print(f"Error calculating DCF: {e}")
         return None
 
+def calculate_dcf_grid(free_cash_flow, shares_outstanding, net_debt, growth_grid, discount_grid, terminal_grid):
+    """
+    Calculates intrinsic value per share over a grid of rates (e.g. from np.meshgrid) in one pass.
+    
+    Returns:
+        np.ndarray: Values broadcast over the three rate grids, NaN where the valuation is undefined.
+    """
+    dcf_kernel = make_dcf_kernel(free_cash_flow, shares_outstanding, net_debt)
+    values = dcf_kernel(growth_grid, discount_grid, terminal_grid)
+    return np.where(np.isfinite(values), values, np.nan)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_financials(ticker):
+    # Raises on failure (or an empty statement) so Streamlit doesn't cache it
+    financials = _ticker(ticker).financials
+    if financials is None or financials.empty:
+        raise ValueError("no financials returned")
+    return financials
+
+def fetch_financials(ticker):
+    """
+    Fetches the annual income statement for a given ticker.
+    """
+    try:
+        return _fetch_financials(ticker)
+    except Exception as e:
+        print(f"Error fetching financials for {ticker}: {e}")
+        return pd.DataFrame()
+
 def calculate_wacc(ticker, info=None):
     """
     Calculates Weighted Average Cost of Capital (WACC).
@@ -206,18 +323,16 @@ def calculate_wacc(ticker, info=None):
         # Cost of Debt
         # Rd = Interest Expense / Total Debt
         # We need financials for Interest Expense
-        stock = yf.Ticker(ticker)
-        financials = stock.financials
+        financials = fetch_financials(ticker)
         interest_expense = 0
         total_debt = info.get('totalDebt')
         
         if not financials.empty:
+            fin_idx = {name: i for i, name in enumerate(financials.index)}
             # Try to find interest expense (often labeled 'Interest Expense')
-            # Look for keys containing 'interest'
-            if 'Interest Expense' in financials.index:
-                interest_expense = abs(financials.loc['Interest Expense'].iloc[0])
-            elif 'Interest Expense Non Operating' in financials.index:
-                 interest_expense = abs(financials.loc['Interest Expense Non Operating'].iloc[0])
+            interest_row = next((n for n in _INTEREST_ROWS if n in fin_idx), None)
+            if interest_row:
+                interest_expense = abs(financials.to_numpy()[fin_idx[interest_row], 0])
             # Sometimes it's inside Net Income components, simplified here.
             
         cost_of_debt = 0.0
@@ -249,14 +364,20 @@ def calculate_wacc(ticker, info=None):
         print(f"Error calculating WACC: {e}")
         return None, None, None
 
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_stock_news(ticker):
+    # Raises on failure (or no news) so Streamlit doesn't cache it
+    news = _ticker(ticker).news
+    if not news:
+        raise ValueError("no news returned")
+    return news
+
 def fetch_stock_news(ticker):
     """
     Fetches latest news for a given ticker.
     """
     try:
-        stock = yf.Ticker(ticker)
-        news = stock.news
-        return news
+        return _fetch_stock_news(ticker)
     except Exception as e:
         print(f"Error fetching news for {ticker}: {e}")
         return []
@@ -269,7 +390,7 @@ def fetch_analyst_ratings(ticker):
     upgrades = None
     
     try:
-        stock = yf.Ticker(ticker)
+        stock = _ticker(ticker)
         # Recommendations (Strong Buy, Buy, etc.) - DataFrame
         rec_summary = stock.recommendations
         
@@ -281,3 +402,19 @@ def fetch_analyst_ratings(ticker):
         
     return rec_summary, upgrades
 
+async def fetch_all(ticker, period="1y", interval="1d", latest_close=None):
+    """
+    Fetches price history, fundamentals, news and analyst ratings for a ticker concurrently.
+    The financials used by calculate_wacc are fetched alongside so that call hits the cache.
+    
+    Returns:
+        tuple: (data, info, news, (rec_summary, upgrades))
+    """
+    data, info, news, ratings, _ = await asyncio.gather(
+        asyncio.to_thread(fetch_stock_data, ticker, period, interval),
+        asyncio.to_thread(fetch_stock_info, ticker, latest_close),
+        asyncio.to_thread(fetch_stock_news, ticker),
+        asyncio.to_thread(fetch_analyst_ratings, ticker),
+        asyncio.to_thread(fetch_financials, ticker),
+    )
+    return data, info, news, ratings